@@ -7,16 +7,16 @@ import argparse
 from pathlib import Path
 from typing import Optional
 from datetime import datetime
-from .docker.builder import DockerBuilder
-from .docker.manager import DockerManager
-from .docker.config import DockerConfig
-from .runner.local import LocalRunner
-from .runner.container import ContainerRunner
 from .utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+def _print_lines(lines):
+    """一次性输出多行文本"""
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
 def _print_images_table(images):
     """打印镜像信息表格 - 自适应列宽"""
     if not images:
@@ -112,31 +112,37 @@ def cmd_build(args):
     use_gpu = getattr(args, "gpu", False)
     registry = getattr(args, "registry", None)
     base_image = getattr(args, "base_image", None)
+    pull = getattr(args, "pull", False)
 
     version_desc = "GPU版本" if use_gpu else "CPU版本"
     print(f"🚀 开始构建Docker镜像 ({version_desc})...")
 
     try:
+        from .docker.builder import DockerBuilder
+
         # 检查Docker连接
         print("🔍 检查Docker环境...")
         builder = DockerBuilder()
 
         image_name, image_id = builder.build_image(
-            args.path, use_gpu, registry, base_image
+            args.path, use_gpu, registry, base_image, pull=pull
         )
 
-        print(f"\n🎉 镜像构建成功!")
-        print(f"   📦 镜像名称: {image_name}")
-        print(f"   🆔 镜像ID: {image_id[:12]}")
-        print(f"   🌍 地理空间支持: 已启用 (rasterio/GDAL/PROJ/GEOS)")
+        lines = [
+            "\n🎉 镜像构建成功!",
+            f"   📦 镜像名称: {image_name}",
+            f"   🆔 镜像ID: {image_id[:12]}",
+            "   🌍 地理空间支持: 已启用 (rasterio/GDAL/PROJ/GEOS)",
+        ]
         if use_gpu:
-            print(f"   🔥 GPU支持: 已启用")
-        print(f"\n💡 下一步操作:")
-        print(f"   📤 推送镜像: inoyb push")
-        print(f"   📋 查看镜像: inoyb images list")
+            lines.append("   🔥 GPU支持: 已启用")
+        lines.append("\n💡 下一步操作:")
+        lines.append("   📤 推送镜像: inoyb push")
+        lines.append("   📋 查看镜像: inoyb images list")
 
         deploy_cmd = "inoyb deploy --gpu" if use_gpu else "inoyb deploy"
-        print(f"   🚀 一键部署: {deploy_cmd}")
+        lines.append(f"   🚀 一键部署: {deploy_cmd}")
+        _print_lines(lines)
 
     except ImportError as e:
         print(f"❌ 依赖缺失: {e}")
@@ -172,6 +178,8 @@ def cmd_push(args):
     print("📤 开始推送镜像...")
 
     try:
+        from .docker.manager import DockerManager
+
         manager = DockerManager()
 
         if args.image:
@@ -209,6 +217,9 @@ def cmd_push(args):
 def cmd_images(args):
     """管理镜像"""
     try:
+        from .docker.builder import DockerBuilder
+        from .docker.manager import DockerManager
+
         builder = DockerBuilder()
         manager = DockerManager()
         if args.action == "list":
@@ -306,6 +317,8 @@ def cmd_images(args):
 def cmd_config(args):
     """配置管理"""
     try:
+        from .docker.config import DockerConfig
+
         config = DockerConfig()
 
         if args.action == "set":
@@ -349,39 +362,41 @@ def cmd_config(args):
                 sys.exit(1)
 
         elif args.action == "list":
-            print("📋 当前配置:")
-            print(f"   Docker服务器: {config.get_docker_host()}")
-            print(
-                f"   使用默认服务器: {'是' if config.is_using_default_server() else '否'}"
-            )
-            print(f"   镜像仓库: {config.get_registry()}")
-            print("   模板支持:")
-            print("     - CPU版本 (默认) - 包含 rasterio/GDAL/PROJ/GEOS")
-            print("     - GPU版本 (--gpu) - 包含 rasterio/GDAL/PROJ/GEOS + CUDA")
+            lines = [
+                "📋 当前配置:",
+                f"   Docker服务器: {config.get_docker_host()}",
+                f"   使用默认服务器: {'是' if config.is_using_default_server() else '否'}",
+                f"   镜像仓库: {config.get_registry()}",
+                "   模板支持:",
+                "     - CPU版本 (默认) - 包含 rasterio/GDAL/PROJ/GEOS",
+                "     - GPU版本 (--gpu) - 包含 rasterio/GDAL/PROJ/GEOS + CUDA",
+            ]
 
             # 显示镜像源配置
             base_config = config.get_base_image_config()
-            print("   镜像源配置:")
+            lines.append("   镜像源配置:")
 
             registry_mirror = base_config.get("registry_mirror")
             if registry_mirror:
-                print(f"     - 镜像加速: {registry_mirror}")
+                lines.append(f"     - 镜像加速: {registry_mirror}")
             else:
-                print("     - 镜像加速: 未设置")
+                lines.append("     - 镜像加速: 未设置")
 
             default_registry = base_config.get("default_registry")
             if default_registry:
-                print(f"     - 默认仓库: {default_registry}")
+                lines.append(f"     - 默认仓库: {default_registry}")
             else:
-                print("     - 默认仓库: 未设置")
+                lines.append("     - 默认仓库: 未设置")
 
             custom_mappings = base_config.get("custom_mappings", {})
             if custom_mappings:
-                print("     - 镜像映射:")
+                lines.append("     - 镜像映射:")
                 for original, target in custom_mappings.items():
-                    print(f"       {original} -> {target}")
+                    lines.append(f"       {original} -> {target}")
             else:
-                print("     - 镜像映射: 未设置")
+                lines.append("     - 镜像映射: 未设置")
+
+            _print_lines(lines)
 
     except Exception as e:
         print(f"❌ 配置操作失败: {e}")
@@ -393,23 +408,28 @@ def cmd_check(args):
     print("🔍 检查项目结构...")
 
     try:
+        from .docker.builder import DockerBuilder
+
         builder = DockerBuilder()
         mc_config, has_examples = builder.validate_project(args.path)
 
-        print("✅ 项目结构检查通过!")
-        print(f"   📋 模型名称: {mc_config['model_info']['name']}")
-        print(f"   📁 包含examples: {'是' if has_examples else '否'}")
-        print("\n📦 项目文件:")
-        print("   ✅ gogogo.py")
-        print("   ✅ mc.json")
-        print("   ✅ requirements.txt")
-        print("   ✅ model/")
+        lines = [
+            "✅ 项目结构检查通过!",
+            f"   📋 模型名称: {mc_config['model_info']['name']}",
+            f"   📁 包含examples: {'是' if has_examples else '否'}",
+            "\n📦 项目文件:",
+            "   ✅ gogogo.py",
+            "   ✅ mc.json",
+            "   ✅ requirements.txt",
+            "   ✅ model/",
+        ]
         if has_examples:
-            print("   ✅ examples/")
+            lines.append("   ✅ examples/")
 
-        print(f"\n💡 项目已准备就绪，可以执行:")
-        print("   🔨 构建镜像: inoyb build")
-        print("   🚀 一键部署: inoyb deploy")
+        lines.append("\n💡 项目已准备就绪，可以执行:")
+        lines.append("   🔨 构建镜像: inoyb build")
+        lines.append("   🚀 一键部署: inoyb deploy")
+        _print_lines(lines)
 
     except Exception as e:
         print(f"❌ 项目结构检查失败: {e}")
@@ -425,6 +445,8 @@ def cmd_check(args):
 def cmd_serve(args):
     """本地运行服务"""
     try:
+        from .runner.local import LocalRunner
+
         runner = LocalRunner()
         runner.run(
             port=args.port,
@@ -445,6 +467,8 @@ def cmd_serve(args):
 def cmd_run(args):
     """运行Docker镜像"""
     try:
+        from .runner.container import ContainerRunner
+
         runner = ContainerRunner()
 
         # 解析环境变量
@@ -494,14 +518,18 @@ def cmd_deploy(args):
         use_gpu = getattr(args, "gpu", False)
         registry = getattr(args, "registry", None)
         base_image = getattr(args, "base_image", None)
+        pull = getattr(args, "pull", False)
 
         version_desc = "GPU版本" if use_gpu else "CPU版本"
         print(f"🚀 开始部署流程 ({version_desc})...")
 
+        from .docker.builder import DockerBuilder
+        from .docker.manager import DockerManager
+
         # 构建镜像
         builder = DockerBuilder()
         image_name, _image_id = builder.build_image(
-            args.path, use_gpu, registry, base_image
+            args.path, use_gpu, registry, base_image, pull=pull
         )
         print(f"✅ 镜像构建成功: {image_name}")
         print("🌍 地理空间支持已启用 (rasterio/GDAL)")
@@ -539,77 +567,14 @@ def cmd_deploy(args):
         sys.exit(1)
 
 
-def main():
-    """主入口点"""
-    parser = argparse.ArgumentParser(
-        prog="inoyb",
-        description="inoyb - 基于mc.json配置的Gradio模型服务框架\n"
-        "支持Docker镜像构建、推送和管理功能",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-示例用法:
-  inoyb check                    # 检查项目结构
-  inoyb serve                    # 本地运行服务
-  inoyb serve --dev --open       # 开发模式，自动打开浏览器
-  inoyb build                    # 构建Docker镜像 (CPU版本，包含rasterio/GDAL)
-  inoyb build --gpu              # 构建GPU版本镜像 (包含rasterio/GDAL+CUDA)
-  inoyb run <镜像名>             # 运行Docker镜像
-  
-  # 镜像源配置
-  inoyb build --registry registry.cn-hangzhou.aliyuncs.com/library  # 使用阿里云
-  inoyb build --base-image my-registry.com/python:3.12-slim         # 自定义镜像
-  
-  inoyb push                     # 推送最新镜像  
-  inoyb deploy                   # 一键构建并推送 (CPU版本)
-  inoyb deploy --gpu             # 一键构建并推送 (GPU版本)
-  
-  # 运行命令示例
-  inoyb run inoyb/my-model:abc123                    # 基本运行
-  inoyb run inoyb/my-model:abc123 --port 8080       # 指定端口
-  inoyb run inoyb/my-model:abc123 --daemon          # 后台运行
-  inoyb run inoyb/my-model:abc123 --env DEBUG=1     # 设置环境变量
-  inoyb images list              # 查看本地镜像列表
-  inoyb images list --remote     # 查看远程镜像列表
-  inoyb images clean --keep 5    # 清理旧镜像
-  inoyb images prune             # 清理构建缓存和无用容器
-  inoyb images export <镜像名>    # 导出镜像为tar包到当前目录
-  inoyb images export <镜像名> -o model.tar  # 指定输出文件名
-  inoyb images export <镜像名> --path ./exports  # 导出到指定目录
-  inoyb images export <镜像名> -o model.tar --path /tmp  # 完整指定
-  
-  # 配置管理
-  inoyb config list              # 查看配置
-  inoyb config set docker.host tcp://my-server:2376
-  inoyb config set registry.mirror registry.cn-hangzhou.aliyuncs.com
-  inoyb config set image.map.python:3.12-slim my-registry.com/python:3.12-slim
-
-网络问题解决方案:
-  # 构建失败时的常见解决方案
-  
-  1. 配置镜像加速 (国内用户强烈推荐)
-     inoyb config set registry.mirror registry.cn-hangzhou.aliyuncs.com
-     
-  2. 使用阿里云镜像源
-     inoyb build --registry registry.cn-hangzhou.aliyuncs.com/library
-     
-  3. 直接指定国内镜像
-     inoyb build --base-image registry.cn-hangzhou.aliyuncs.com/library/continuumio/miniconda3:24.3.0-0
-        """,
-    )
-
-    subparsers = parser.add_subparsers(dest="command", help="可用命令")
-
-    # check命令
-    check_parser = subparsers.add_parser(
-        "check", help="检查项目结构", description="验证项目是否符合inoyb的构建要求"
-    )
+def _add_check_arguments(check_parser):
+    """check命令参数"""
     check_parser.add_argument("--path", default=".", help="项目路径 (默认: 当前目录)")
     check_parser.set_defaults(func=cmd_check)
 
-    # serve命令
-    serve_parser = subparsers.add_parser(
-        "serve", help="本地运行服务", description="在本地启动gogogo.py服务"
-    )
+
+def _add_serve_arguments(serve_parser):
+    """serve命令参数"""
     serve_parser.add_argument("--path", default=".", help="项目路径 (默认: 当前目录)")
     serve_parser.add_argument(
         "--port", type=int, default=7860, help="服务端口 (默认: 7860)"
@@ -625,10 +590,9 @@ def main():
     serve_parser.add_argument("--verbose", action="store_true", help="详细日志输出")
     serve_parser.set_defaults(func=cmd_serve)
 
-    # run命令
-    run_parser = subparsers.add_parser(
-        "run", help="运行Docker镜像", description="启动Docker镜像容器"
-    )
+
+def _add_run_arguments(run_parser):
+    """run命令参数"""
     run_parser.add_argument("image", help="Docker镜像名 (如: inoyb/my-model:abc123)")
     run_parser.add_argument(
         "--port", type=int, default=7860, help="端口映射 (默认: 7860)"
@@ -647,12 +611,9 @@ def main():
     )
     run_parser.set_defaults(func=cmd_run)
 
-    # build命令
-    build_parser = subparsers.add_parser(
-        "build",
-        help="构建Docker镜像",
-        description="从项目源码构建Docker镜像。需要gogogo.py, mc.json, requirements.txt和model/目录",
-    )
+
+def _add_build_arguments(build_parser):
+    """build命令参数"""
     build_parser.add_argument("--path", default=".", help="项目路径 (默认: 当前目录)")
     build_parser.add_argument("--gpu", action="store_true", help="启用GPU支持")
     build_parser.add_argument(
@@ -662,17 +623,20 @@ def main():
     build_parser.add_argument(
         "--base-image", help="完整的基础镜像名 (如: my-registry.com/python:3.12-slim)"
     )
+    build_parser.add_argument(
+        "--pull", action="store_true", help="构建前拉取最新基础镜像"
+    )
     build_parser.set_defaults(func=cmd_build)
 
-    # push命令
-    push_parser = subparsers.add_parser(
-        "push", help="推送Docker镜像", description="推送镜像到远程Docker服务器"
-    )
+
+def _add_push_arguments(push_parser):
+    """push命令参数"""
     push_parser.add_argument("--image", help="指定镜像名称 (默认: 最新镜像)")
     push_parser.set_defaults(func=cmd_push)
 
-    # images命令
-    images_parser = subparsers.add_parser("images", help="管理镜像")
+
+def _add_images_arguments(images_parser):
+    """images命令参数"""
     images_subparsers = images_parser.add_subparsers(dest="action", help="镜像操作")
 
     # images list
@@ -700,8 +664,9 @@ def main():
 
     images_parser.set_defaults(func=cmd_images)
 
-    # config命令
-    config_parser = subparsers.add_parser("config", help="配置管理")
+
+def _add_config_arguments(config_parser):
+    """config命令参数"""
     config_subparsers = config_parser.add_subparsers(dest="action", help="配置操作")
 
     # config set
@@ -714,12 +679,9 @@ def main():
 
     config_parser.set_defaults(func=cmd_config)
 
-    # deploy命令
-    deploy_parser = subparsers.add_parser(
-        "deploy",
-        help="一键构建并推送",
-        description="构建Docker镜像并推送到远程服务器的组合命令",
-    )
+
+def _add_deploy_arguments(deploy_parser):
+    """deploy命令参数"""
     deploy_parser.add_argument("--path", default=".", help="项目路径 (默认: 当前目录)")
     deploy_parser.add_argument("--gpu", action="store_true", help="启用GPU支持")
     deploy_parser.add_argument(
@@ -729,10 +691,129 @@ def main():
     deploy_parser.add_argument(
         "--base-image", help="完整的基础镜像名 (如: my-registry.com/python:3.12-slim)"
     )
+    deploy_parser.add_argument(
+        "--pull", action="store_true", help="构建前拉取最新基础镜像"
+    )
     deploy_parser.set_defaults(func=cmd_deploy)
 
+
+# 子命令表: 命令名 -> (帮助信息, 描述, 参数构建函数)
+_COMMANDS = {
+    "check": ("检查项目结构", "验证项目是否符合inoyb的构建要求", _add_check_arguments),
+    "serve": ("本地运行服务", "在本地启动gogogo.py服务", _add_serve_arguments),
+    "run": ("运行Docker镜像", "启动Docker镜像容器", _add_run_arguments),
+    "build": (
+        "构建Docker镜像",
+        "从项目源码构建Docker镜像。需要gogogo.py, mc.json, requirements.txt和model/目录",
+        _add_build_arguments,
+    ),
+    "push": ("推送Docker镜像", "推送镜像到远程Docker服务器", _add_push_arguments),
+    "images": ("管理镜像", None, _add_images_arguments),
+    "config": ("配置管理", None, _add_config_arguments),
+    "deploy": (
+        "一键构建并推送",
+        "构建Docker镜像并推送到远程服务器的组合命令",
+        _add_deploy_arguments,
+    ),
+}
+
+
+class _LazyEpilogArgumentParser(argparse.ArgumentParser):
+    """仅在输出帮助信息时才生成epilog的参数解析器"""
+
+    def __init__(self, *args, epilog_factory=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._epilog_factory = epilog_factory
+
+    def format_help(self):
+        if self.epilog is None and self._epilog_factory is not None:
+            self.epilog = self._epilog_factory()
+        return super().format_help()
+
+
+def _usage_examples() -> str:
+    """主命令帮助信息中的示例用法"""
+    return """
+示例用法:
+  inoyb check                    # 检查项目结构
+  inoyb serve                    # 本地运行服务
+  inoyb serve --dev --open       # 开发模式，自动打开浏览器
+  inoyb build                    # 构建Docker镜像 (CPU版本，包含rasterio/GDAL)
+  inoyb build --gpu              # 构建GPU版本镜像 (包含rasterio/GDAL+CUDA)
+  inoyb build --pull             # 构建前拉取最新基础镜像
+  inoyb run <镜像名>             # 运行Docker镜像
+  
+  # 镜像源配置
+  inoyb build --registry registry.cn-hangzhou.aliyuncs.com/library  # 使用阿里云
+  inoyb build --base-image my-registry.com/python:3.12-slim         # 自定义镜像
+  
+  inoyb push                     # 推送最新镜像  
+  inoyb deploy                   # 一键构建并推送 (CPU版本)
+  inoyb deploy --gpu             # 一键构建并推送 (GPU版本)
+  
+  # 运行命令示例
+  inoyb run inoyb/my-model:abc123                    # 基本运行
+  inoyb run inoyb/my-model:abc123 --port 8080       # 指定端口
+  inoyb run inoyb/my-model:abc123 --daemon          # 后台运行
+  inoyb run inoyb/my-model:abc123 --env DEBUG=1     # 设置环境变量
+  inoyb images list              # 查看本地镜像列表
+  inoyb images list --remote     # 查看远程镜像列表
+  inoyb images clean --keep 5    # 清理旧镜像
+  inoyb images prune             # 清理构建缓存和无用容器
+  inoyb images export <镜像名>    # 导出镜像为tar包到当前目录
+  inoyb images export <镜像名> -o model.tar  # 指定输出文件名
+  inoyb images export <镜像名> --path ./exports  # 导出到指定目录
+  inoyb images export <镜像名> -o model.tar --path /tmp  # 完整指定
+  
+  # 配置管理
+  inoyb config list              # 查看配置
+  inoyb config set docker.host tcp://my-server:2376
+  inoyb config set registry.mirror registry.cn-hangzhou.aliyuncs.com
+  inoyb config set image.map.python:3.12-slim my-registry.com/python:3.12-slim
+
+网络问题解决方案:
+  # 构建失败时的常见解决方案
+  
+  1. 配置镜像加速 (国内用户强烈推荐)
+     inoyb config set registry.mirror registry.cn-hangzhou.aliyuncs.com
+     
+  2. 使用阿里云镜像源
+     inoyb build --registry registry.cn-hangzhou.aliyuncs.com/library
+     
+  3. 直接指定国内镜像
+     inoyb build --base-image registry.cn-hangzhou.aliyuncs.com/library/continuumio/miniconda3:24.3.0-0
+        """
+
+
+def main():
+    """主入口点"""
+    parser = _LazyEpilogArgumentParser(
+        prog="inoyb",
+        description="inoyb - 基于mc.json配置的Gradio模型服务框架\n"
+        "支持Docker镜像构建、推送和管理功能",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog_factory=_usage_examples,
+    )
+
+    subparsers = parser.add_subparsers(dest="command", help="可用命令")
+
+    # 只为实际执行的子命令构建完整参数；未指定或未知命令时仅列出命令名
+    argv = sys.argv[1:]
+    selected = next((arg for arg in argv if not arg.startswith("-")), None)
+    if selected not in _COMMANDS:
+        selected = None
+
+    for name, (help_text, description, add_arguments) in _COMMANDS.items():
+        if selected is not None and name != selected:
+            continue
+        command_parser = subparsers.add_parser(
+            name, help=help_text, description=description
+        )
+        if name == selected:
+            add_arguments(command_parser)
+
     # 解析参数
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if not args.command:
         parser.print_help()
@@ -2,14 +2,21 @@
 Docker镜像构建器
 """
 
+import os
+import re
 import sys
 import json
-import uuid
+import secrets
 import time
+import operator
+import functools
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict, Any
 from ..utils.logger import get_logger
-from .config import DockerConfig
+from .config import DockerConfig, _loads
+from .client import get_docker_client
 
 
 try:
@@ -19,46 +26,76 @@ except ImportError:
 
 logger = get_logger(__name__)
 
+# 构建上下文中生成的Dockerfile名称
+_BUILD_DOCKERFILE_NAME = "Dockerfile.inoyb"
+
+# Dockerfile模板中的占位符及花括号转义
+_TEMPLATE_TOKEN_RE = re.compile(r"\{\{|\}\}|\{(base_image|examples_copy)\}")
+
+# 镜像名称中需要替换为"-"的字符
+_IMAGE_NAME_TABLE = str.maketrans({" ": "-", "_": "-"})
+
+# 版本映射策略 - 使用miniconda3以支持rasterio和GDAL
+_MINICONDA3_VERSION_MAP = {
+    (3, 8): "continuumio/miniconda3:4.9.2",
+    (3, 9): "continuumio/miniconda3:4.12.0",
+    (3, 10): "continuumio/miniconda3:22.11.1",
+    (3, 11): "continuumio/miniconda3:23.3.1-0",
+    (3, 12): "continuumio/miniconda3:24.3.0-0",
+    (3, 13): "continuumio/miniconda3:25.3.1-1",
+}
+
+# 当前Python版本对应的基础镜像，进程内不会变化
+_MINICONDA3_BASE_IMAGE = _MINICONDA3_VERSION_MAP.get(
+    sys.version_info[:2], "continuumio/miniconda3:23.3.1-0"
+)
+
+
+@functools.lru_cache(maxsize=8)
+def _read_template(path_str: str, mtime_ns: int) -> str:
+    """读取Dockerfile模板内容，按(路径, 修改时间)缓存"""
+    with open(path_str, "r", encoding="utf-8") as f:
+        return f.read()
+
 
 class DockerBuilder:
     """Docker镜像构建器"""
 
+    # 内置模板目录
+    TEMPLATES_DIR = Path(__file__).parent / "templates"
+
     def __init__(self):
-        try:
-            self.client = docker.from_env()
-            # 测试Docker连接
-            self.client.ping()
-            # 初始化配置
-            self.config = DockerConfig()
-        except docker.errors.DockerException as e:
-            if "Cannot connect to the Docker daemon" in str(e):
-                raise Exception("无法连接到Docker服务，请确保Docker已启动")
-            else:
-                raise Exception(f"Docker连接异常: {e}")
-        except Exception as e:
-            raise Exception(f"无法连接到Docker服务: {e}")
+        # 模板路径缓存: use_gpu -> 模板路径
+        self._template_path_cache: Dict[bool, Path] = {}
+        # Docker客户端延迟到首次使用时再连接，项目检查等操作无需Docker服务
+        self._client = None
+        # 初始化配置
+        self.config = DockerConfig()
+
+    @property
+    def client(self):
+        """本地Docker客户端"""
+        if self._client is None:
+            try:
+                self._client = get_docker_client()
+            except docker.errors.DockerException as e:
+                if "Cannot connect to the Docker daemon" in str(e):
+                    raise Exception("无法连接到Docker服务，请确保Docker已启动")
+                else:
+                    raise Exception(f"Docker连接异常: {e}")
+            except Exception as e:
+                raise Exception(f"无法连接到Docker服务: {e}")
+        return self._client
 
     def generate_image_name(self, model_name: str) -> str:
         """生成镜像名称: model_name:UUID"""
-        clean_name = model_name.lower().replace(" ", "-").replace("_", "-")
-        image_uuid = uuid.uuid4().hex[:8]
+        clean_name = model_name.lower().translate(_IMAGE_NAME_TABLE)
+        image_uuid = secrets.token_hex(4)
         return f"{clean_name}:{image_uuid}"
 
     def get_miniconda3_version(self) -> str:
         """获取当前miniconda3版本对应的Docker基础镜像"""
-        major, minor = sys.version_info.major, sys.version_info.minor
-
-        # 版本映射策略 - 使用miniconda3以支持rasterio和GDAL
-        version_map = {
-            (3, 8): "continuumio/miniconda3:4.9.2",
-            (3, 9): "continuumio/miniconda3:4.12.0",
-            (3, 10): "continuumio/miniconda3:22.11.1",
-            (3, 11): "continuumio/miniconda3:23.3.1-0",
-            (3, 12): "continuumio/miniconda3:24.3.0-0",
-            (3, 13): "continuumio/miniconda3:25.3.1-1",
-        }
-
-        return version_map.get((major, minor), "continuumio/miniconda3:23.3.1-0")
+        return _MINICONDA3_BASE_IMAGE
 
     def check_nested_directories(self, directory: Path, dir_name: str) -> bool:
         """检查目录是否存在多余的嵌套结构
@@ -70,18 +107,21 @@ class DockerBuilder:
         Returns:
             bool: True表示结构正确，False表示存在嵌套问题
         """
-        if not directory.exists() or not directory.is_dir():
+        try:
+            it = os.scandir(directory)
+        except (FileNotFoundError, NotADirectoryError):
             return True  # 目录不存在或不是目录，跳过检查
 
-        # 获取目录下的所有内容
-        contents = list(directory.iterdir())
-
-        # 如果目录为空，这是正常的
-        if not contents:
-            return True
+        # 只需判断是否恰好有一项，最多读取两个目录项
+        with it:
+            first = next(it, None)
+            # 如果目录为空，这是正常的
+            if first is None:
+                return True
+            second = next(it, None)
 
         # 检查是否只有一个子目录，且名称与父目录相同
-        if len(contents) == 1 and contents[0].is_dir() and contents[0].name == dir_name:
+        if second is None and first.is_dir() and first.name == dir_name:
             logger.warning(f"检测到多余的嵌套目录: {directory}/{dir_name}/")
             logger.warning(
                 f"建议将 {directory}/{dir_name}/ 目录下的内容直接放在 {directory}/ 下"
@@ -100,6 +140,9 @@ class DockerBuilder:
         1. 项目级模板 (.inoyb/)
         2. 内置模板
         """
+        if use_gpu in self._template_path_cache:
+            return self._template_path_cache[use_gpu]
+
         # 确定模板文件名
         if use_gpu:
             template_name = "dockerfile-gpu.template"
@@ -114,16 +157,17 @@ class DockerBuilder:
         project_template = Path(".inoyb") / project_template_name
         if project_template.exists():
             logger.info(f"使用项目级模板: {project_template}")
+            self._template_path_cache[use_gpu] = project_template
             return project_template
 
         # 2. 使用内置模板
-        package_dir = Path(__file__).parent
-        default_template = package_dir / "templates" / template_name
+        default_template = self.TEMPLATES_DIR / template_name
 
         if not default_template.exists():
             raise FileNotFoundError(f"未找到Dockerfile模板: {default_template}")
 
         logger.info(f"使用内置模板{template_desc}: {template_name}")
+        self._template_path_cache[use_gpu] = default_template
         return default_template
 
     def generate_dockerfile(
@@ -161,18 +205,18 @@ class DockerBuilder:
         # 读取模板文件
         template_path = self.get_template_path(use_gpu=use_gpu)
         try:
-            with open(template_path, "r", encoding="utf-8") as f:
-                template_content = f.read()
+            template_content = _read_template(
+                str(template_path), template_path.stat().st_mtime_ns
+            )
         except Exception as e:
             raise Exception(f"读取Dockerfile模板失败: {e}")
 
-        # 替换模板变量
-        try:
-            dockerfile_content = template_content.format(
-                base_image=resolved_base_image, examples_copy=examples_copy
-            )
-        except KeyError as e:
-            raise Exception(f"Dockerfile模板变量错误: {e}")
+        # 替换模板变量，与原str.format写法兼容：{{ 和 }} 还原为单个花括号
+        values = {"base_image": resolved_base_image, "examples_copy": examples_copy}
+        dockerfile_content = _TEMPLATE_TOKEN_RE.sub(
+            lambda m: values[m.group(1)] if m.group(1) else m.group(0)[0],
+            template_content,
+        )
 
         return dockerfile_content
 
@@ -186,15 +230,22 @@ class DockerBuilder:
 
         logger.info(f"验证项目结构: {project_path}")
 
+        # 一次读取项目根目录，后续检查复用目录项缓存的类型信息
+        try:
+            with os.scandir(project_path) as it:
+                entries = {entry.name: entry for entry in it}
+        except (FileNotFoundError, NotADirectoryError):
+            entries = {}
+
         # 1. 检查必需文件
         required_files = ["gogogo.py", "mc.json", "requirements.txt"]
         missing_files = []
 
         for file in required_files:
-            file_path = project_path / file
-            if not file_path.exists():
+            entry = entries.get(file)
+            if entry is None:
                 missing_files.append(file)
-            elif not file_path.is_file():
+            elif not entry.is_file():
                 missing_files.append(f"{file} (不是文件)")
 
         if missing_files:
@@ -204,16 +255,17 @@ class DockerBuilder:
 
         # 2. 检查model目录
         model_dir = project_path / "model"
-        if not model_dir.exists():
+        model_entry = entries.get("model")
+        if model_entry is None:
             raise FileNotFoundError("❌ 项目结构不正确，缺少model目录")
 
-        if not model_dir.is_dir():
+        if not model_entry.is_dir():
             raise FileNotFoundError("❌ model不是目录")
 
         # 检查model目录是否为空
-        model_contents = list(model_dir.iterdir())
-        if not model_contents:
-            logger.warning("⚠️  model目录为空")
+        with os.scandir(model_dir) as it:
+            if next(it, None) is None:
+                logger.warning("⚠️  model目录为空")
 
         # 3. 检查model目录嵌套结构
         if not self.check_nested_directories(model_dir, "model"):
@@ -221,10 +273,11 @@ class DockerBuilder:
 
         # 4. 检查examples目录（可选）
         examples_dir = project_path / "examples"
+        examples_entry = entries.get("examples")
         has_examples = False
 
-        if examples_dir.exists():
-            if not examples_dir.is_dir():
+        if examples_entry is not None:
+            if not examples_entry.is_dir():
                 logger.warning("⚠️  examples存在但不是目录，将被忽略")
             else:
                 has_examples = True
@@ -237,8 +290,7 @@ class DockerBuilder:
         # 5. 读取mc.json配置
         mc_json_path = project_path / "mc.json"
         try:
-            with open(mc_json_path, "r", encoding="utf-8") as f:
-                mc_config = json.load(f)
+            mc_config = _loads(mc_json_path.read_bytes())
         except json.JSONDecodeError as e:
             raise ValueError(f"❌ mc.json格式错误: {e}")
         except Exception as e:
@@ -279,9 +331,12 @@ class DockerBuilder:
         use_gpu: bool = False,
         registry: str = None,
         base_image: str = None,
+        pull: bool = False,
     ) -> tuple[str, str]:
         """构建Docker镜像 - 带重试机制的包装器"""
-        return self._build_image_with_retry(project_path, use_gpu, registry, base_image)
+        return self._build_image_with_retry(
+            project_path, use_gpu, registry, base_image, pull=pull
+        )
 
     def _build_image_with_retry(
         self,
@@ -290,12 +345,13 @@ class DockerBuilder:
         registry: str = None,
         base_image: str = None,
         max_retries: int = 3,
+        pull: bool = False,
     ) -> tuple[str, str]:
         """带重试机制的镜像构建"""
         for attempt in range(max_retries):
             try:
                 return self._build_image_internal(
-                    project_path, use_gpu, registry, base_image
+                    project_path, use_gpu, registry, base_image, pull
                 )
             except Exception as e:
                 error_msg = str(e)
@@ -485,6 +541,7 @@ class DockerBuilder:
         use_gpu: bool = False,
         registry: str = None,
         base_image: str = None,
+        pull: bool = False,
     ) -> tuple[str, str]:
         """构建Docker镜像
 
@@ -493,12 +550,16 @@ class DockerBuilder:
             use_gpu: 是否使用GPU支持
             registry: 镜像仓库前缀
             base_image: 完整的基础镜像名
+            pull: 构建前是否拉取最新基础镜像
 
         Returns:
             tuple: (image_name, image_id)
         """
         project_path = Path(project_path).resolve()
 
+        # 先连接Docker服务，避免服务不可用时仍然打包整个项目
+        self.client
+
         logger.info(f"🚀 开始构建Docker镜像")
         logger.info(f"   项目路径: {project_path}")
 
@@ -520,13 +581,10 @@ class DockerBuilder:
         dockerfile_content = self.generate_dockerfile(
             project_path, has_examples, use_gpu, registry, base_image
         )
-        dockerfile_path = project_path / "Dockerfile.inoyb"
+        # 打包构建上下文，Dockerfile直接写入归档，不修改项目目录
+        build_context = self._create_build_context(project_path, dockerfile_content)
 
         try:
-            # 写入临时Dockerfile
-            with open(dockerfile_path, "w", encoding="utf-8") as f:
-                f.write(dockerfile_content)
-
             logger.info("🔨 开始构建镜像...")
             logger.info("💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡💡")
 
@@ -540,25 +598,18 @@ class DockerBuilder:
 
                 # 使用低级API
                 build_logs = self.client.api.build(
-                    path=str(project_path),
-                    dockerfile="Dockerfile.inoyb",
+                    fileobj=build_context,
+                    custom_context=True,
+                    dockerfile=_BUILD_DOCKERFILE_NAME,
                     tag=full_image_name,
                     rm=True,  # 删除中间容器
-                    pull=True,  # 拉取最新基础镜像
+                    pull=pull,  # 是否拉取最新基础镜像
                     forcerm=True,  # 强制删除中间容器（即使构建失败）
                     buildargs=build_args,
+                    decode=True,  # 由SDK逐条解析为字典，边构建边输出
                 )
 
                 for log_line in build_logs:
-                    # 解析日志行（可能是字节格式）
-                    if isinstance(log_line, bytes):
-                        try:
-                            import json
-
-                            log_line = json.loads(log_line.decode("utf-8"))
-                        except (json.JSONDecodeError, UnicodeDecodeError):
-                            continue
-
                     # 实时处理每一行日志
                     if isinstance(log_line, dict):
                         if "stream" in log_line:
@@ -614,28 +665,6 @@ class DockerBuilder:
                         elif "aux" in log_line and "ID" in log_line["aux"]:
                             image_id = log_line["aux"]["ID"]
 
-                    elif isinstance(log_line, (str, bytes)):
-                        # 处理字符串或字节格式的日志
-                        if isinstance(log_line, bytes):
-                            try:
-                                decoded_log = log_line.decode("utf-8").rstrip("\n\r")
-                            except UnicodeDecodeError:
-                                decoded_log = log_line.decode(
-                                    "utf-8", errors="ignore"
-                                ).rstrip("\n\r")
-                        else:
-                            decoded_log = log_line.rstrip("\n\r")
-
-                        if self._should_show_log(decoded_log):
-                            log_type, formatted_content = (
-                                self._get_log_type_and_content(decoded_log)
-                            )
-                            colored_output = self._format_log_with_color(
-                                formatted_content, log_type
-                            )
-                            print(colored_output)
-                            sys.stdout.flush()
-
                 # 获取构建成功的镜像对象
                 if image_id:
                     image = self.client.images.get(image_id)
@@ -672,34 +701,71 @@ class DockerBuilder:
                     raise build_error
 
         finally:
-            # 清理临时Dockerfile
-            if dockerfile_path.exists():
-                dockerfile_path.unlink()
-                logger.info("🧹 已清理临时Dockerfile")
+            build_context.close()
+
+    def _create_build_context(self, project_path: Path, dockerfile_content: str):
+        """将项目目录和生成的Dockerfile打包为构建上下文
+
+        遵循项目中的 .dockerignore，归档写入临时文件以避免大模型占用内存
+
+        Returns:
+            已定位到开头的tar文件对象
+        """
+        exclude = []
+        dockerignore = project_path / ".dockerignore"
+        if dockerignore.is_file():
+            with open(dockerignore, "r", encoding="utf-8") as f:
+                exclude = [
+                    line.strip()
+                    for line in f
+                    if line.strip() and not line.strip().startswith("#")
+                ]
+
+        return docker.utils.tar(
+            str(project_path),
+            exclude=exclude,
+            dockerfile=(_BUILD_DOCKERFILE_NAME, dockerfile_content),
+        )
 
     def list_local_images(self, project_filter: Optional[str] = None) -> list:
         """列出本地inoyb镜像"""
         try:
-
-            images = self.client.images.list()
+            # 由Docker服务端按仓库名过滤，只返回inoyb镜像
+            images = self.client.images.list(filters={"reference": "inoyb/*"})
             inoyb_images = []
+            append = inoyb_images.append
+            prefix = "inoyb/"
 
             for image in images:
-                for tag in image.tags:
-                    if tag.startswith("inoyb/"):
-                        # 获取详细的镜像信息
-                        image_info = {
+                # 同一镜像可能还带有其他仓库的标签
+                tags = [
+                    tag
+                    for tag in image.tags
+                    if tag.startswith(prefix)
+                    and (not project_filter or project_filter in tag)
+                ]
+                if not tags:
+                    continue
+
+                image_id = image.id[:12]
+                created = image.attrs["Created"]
+                size = image.attrs["Size"]
+                # 计算模型文件大小（每个镜像只分析一次构建历史）
+                model_size = self._calculate_model_size(image)
+
+                for tag in tags:
+                    append(
+                        {
                             "name": tag,
-                            "id": image.id[:12],
-                            "created": image.attrs["Created"],
-                            "size": image.attrs["Size"],
+                            "id": image_id,
+                            "created": created,
+                            "size": size,
+                            "model_size": model_size,
                         }
-                        # 计算模型文件大小
-                        image_info["model_size"] = self._calculate_model_size(image)
-
-                        if project_filter is None or project_filter in tag:
-                            inoyb_images.append(image_info)
-            return sorted(inoyb_images, key=lambda x: x["created"], reverse=True)
+                    )
+            return sorted(
+                inoyb_images, key=operator.itemgetter("created"), reverse=True
+            )
 
         except Exception as e:
             logger.error(f"获取镜像列表失败: {e}")
@@ -722,27 +788,33 @@ class DockerBuilder:
         if len(images) <= keep_count:
             return 0
 
-        # 按项目分组
-        project_groups = {}
+        # 按项目分组（images已按创建时间从新到旧排序）
+        project_groups = defaultdict(list)
         for img in images:
             # 提取项目名 (去掉UUID标签部分)
-            full_name = img["name"].replace("inoyb/", "")
+            full_name = img["name"][len("inoyb/") :]
             if ":" in full_name:
-                project_name = full_name.split(":")[0]  # 去掉标签部分
-                if project_name not in project_groups:
-                    project_groups[project_name] = []
+                project_name = full_name.split(":", 1)[0]  # 去掉标签部分
                 project_groups[project_name].append(img)
 
-        removed_count = 0
-        for project_name, project_images in project_groups.items():
-            if len(project_images) > keep_count:
-                # 保留最新的keep_count个，删除其余的
-                to_remove = project_images[keep_count:]
-                for img in to_remove:
-                    if self.remove_image(img["name"]):
-                        removed_count += 1
+        # 保留每个项目最新的keep_count个，删除其余的
+        # 按镜像ID归并标签：同一镜像的多个标签必须依次删除，否则并发的强制删除会互相冲突
+        to_remove = defaultdict(list)
+        for project_images in project_groups.values():
+            for img in project_images[keep_count:]:
+                to_remove[img["id"]].append(img["name"])
+        if not to_remove:
+            return 0
+
+        # 不同镜像的删除是相互独立的HTTP请求，并发执行
+        with ThreadPoolExecutor(max_workers=min(8, len(to_remove))) as executor:
+            results = list(executor.map(self._remove_tags, to_remove.values()))
+
+        return sum(results)
 
-        return removed_count
+    def _remove_tags(self, tags: list) -> int:
+        """依次删除同一镜像的多个标签，返回成功删除的数量"""
+        return sum(self.remove_image(tag) for tag in tags)
 
     def _calculate_model_size(self, image) -> int:
         """通过分析镜像历史来计算模型文件大小"""
@@ -0,0 +1,36 @@
+"""
+本地Docker客户端共享
+"""
+
+import atexit
+from typing import Optional
+
+try:
+    import docker
+except ImportError:
+    raise ImportError("Docker库未安装，请运行: pip install docker>=7.0.0")
+
+_client: Optional[docker.DockerClient] = None
+
+
+def get_docker_client() -> docker.DockerClient:
+    """获取进程内共享的本地Docker客户端
+
+    首次调用时通过环境变量创建客户端并测试连接，之后复用同一实例
+    """
+    global _client
+    if _client is None:
+        client = docker.from_env()
+        # 测试Docker连接
+        client.ping()
+        _client = client
+    return _client
+
+
+def _close_docker_client():
+    """进程退出时关闭共享客户端"""
+    if _client is not None:
+        _client.close()
+
+
+atexit.register(_close_docker_client)
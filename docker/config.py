@@ -9,9 +9,32 @@ LastEditTime: 2025-08-01 16:16:36
 Docker配置管理
 """
 
+import copy
 import json
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+except ImportError:
+    # orjson为可选依赖，未安装时回退到标准库json
+    def _loads(data: bytes):
+        return json.loads(data.decode("utf-8"))
+
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+# 已解析的配置文件缓存: (配置文件路径, 修改时间) -> 配置
+_CONFIG_CACHE: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+# 本进程内已确认存在的配置目录
+_ENSURED_DIRS = set()
 
 
 class DockerConfig:
@@ -25,19 +48,39 @@ class DockerConfig:
 
     def _ensure_config_dir(self):
         """确保配置目录存在"""
+        if self.config_dir in _ENSURED_DIRS:
+            return
         self.config_dir.mkdir(exist_ok=True)
+        _ENSURED_DIRS.add(self.config_dir)
+
+    def _config_cache_key(self) -> Tuple[str, int]:
+        """配置缓存键，文件修改后自动失效"""
+        try:
+            mtime_ns = self.config_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = 0
+        return (str(self.config_file), mtime_ns)
 
     def _load_config(self):
         """加载配置文件"""
-        if self.config_file.exists():
+        key = self._config_cache_key()
+        cached = _CONFIG_CACHE.get(key)
+        if cached is not None:
+            self.config = copy.deepcopy(cached)
+            return
+
+        # 修改时间为0表示配置文件不存在
+        if key[1] != 0:
             try:
-                with open(self.config_file, "r", encoding="utf-8") as f:
-                    self.config = json.load(f)
+                self.config = _loads(self.config_file.read_bytes())
             except Exception:
                 self.config = self._default_config()
+                return
         else:
             self.config = self._default_config()
 
+        _CONFIG_CACHE[key] = copy.deepcopy(self.config)
+
     def _default_config(self) -> Dict[str, Any]:
         """默认配置"""
         return {
@@ -56,8 +99,9 @@ class DockerConfig:
 
     def save_config(self):
         """保存配置到文件"""
-        with open(self.config_file, "w", encoding="utf-8") as f:
-            json.dump(self.config, f, indent=2, ensure_ascii=False)
+        with open(self.config_file, "wb") as f:
+            f.write(_dumps(self.config))
+        _CONFIG_CACHE[self._config_cache_key()] = copy.deepcopy(self.config)
 
     def get_docker_host(self) -> str:
         """获取当前Docker服务器地址"""
@@ -4,6 +4,7 @@ Docker镜像管理器
 
 from typing import Optional, List, Dict, Any
 from .config import DockerConfig
+from .client import get_docker_client
 from ..utils.logger import get_logger
 
 try:
@@ -18,7 +19,7 @@ class DockerManager:
     
     def __init__(self):
         self.config = DockerConfig()
-        self.local_client = docker.from_env()
+        self.local_client = get_docker_client()
         self._remote_client = None
     
     def get_remote_client(self):